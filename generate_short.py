@@ -1,26 +1,52 @@
 import requests
 import random
+import queue
+import threading
+import io
+import wave
 import re
 import os
-import uuid
-import shutil
+import subprocess
+import tempfile
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Optional, Tuple, Dict
 
+# OpenCV is optional: it only speeds up the title card's pop-in resize
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# orjson is optional: it only speeds up parsing the Reddit listing
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# httpx is optional: with its h2 extra the Reddit fetch goes over HTTP/2
+try:
+    import httpx
+except ImportError:
+    httpx = None
+from PIL import Image, ImageDraw, ImageFont
+
 # Google Cloud
 from google.cloud import texttospeech
+from google.api_core import exceptions as api_exceptions, retry as api_retry
+from google.api_core.timeout import ConstantTimeout
 
 # MoviePy Imports (v2 syntax)
 from moviepy import (
-    VideoFileClip, AudioFileClip, concatenate_audioclips, 
-    concatenate_videoclips, ImageClip, CompositeAudioClip
+    AudioFileClip, ImageClip
 )
-from moviepy.video.VideoClip import TextClip, ColorClip
+from moviepy.video.VideoClip import TextClip, VideoClip
 from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
-from moviepy.audio.AudioClip import AudioArrayClip
+from moviepy.config import FFMPEG_BINARY
 from moviepy.video import fx as vfx
-from moviepy.audio import fx as afx
 
 # ==========================================
 # 1. CONFIGURATION
@@ -29,8 +55,10 @@ from moviepy.audio import fx as afx
 class VideoConfig:
     # API & Paths
     google_credentials: str = "google.json"
-    temp_audio_dir: str = "temp_audio"
     output_filename: str = "youtube_short.mp4"
+    reddit_cache_dir: str = "reddit_cache"  # hot.json + ETag per subreddit
+    reddit_cache_ttl: int = 600  # Seconds a cached listing is reused without asking Reddit
+    background_cache_dir: str = "background_cache"  # Pre-cropped, looped background renders
     
     # Assets
     subway_video: str = "subway.mp4"
@@ -41,26 +69,75 @@ class VideoConfig:
     
     # Settings
     subreddits: List[str] = field(default_factory=lambda: ["AmIOverreacting", "AmITheAsshole", "rant", "AmITheDevil"])
+    tts_voice: str = "en-US-Wavenet-C"  # Chirp 3 HD voices are synthesized over the streaming RPC
     user_agent: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
     
     # Logic / Testing
     mock_tts: bool = False
+    fps: int = 24  # Plenty for text over gameplay; 30 would encode 25% more frames
+    video_codec: Optional[str] = None  # None = auto-detect (GPU encoder, else libx264)
     limit_sentences: int = 3  # Set to None for full story
     avg_wpm: int = 180
 
     def __post_init__(self):
         # Set Env var for Google
         os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = self.google_credentials
-        # Ensure temp dir exists
-        if not os.path.exists(self.temp_audio_dir):
-            os.makedirs(self.temp_audio_dir)
+
+# Hardware H.264 encoders, in order of preference, with their ffmpeg options.
+HW_ENCODERS = {
+    "h264_nvenc": ["-preset", "p1", "-tune", "ll", "-rc", "vbr", "-cq", "23", "-pix_fmt", "yuv420p"],
+    "h264_amf": ["-quality", "balanced", "-rc", "cqp", "-qp_i", "23", "-qp_p", "23", "-pix_fmt", "yuv420p"],
+    "h264_videotoolbox": ["-q:v", "65", "-pix_fmt", "yuv420p"],
+    "h264_qsv": ["-preset", "medium", "-global_quality", "23", "-pix_fmt", "nv12"],
+}
+# Software fallbacks, used when no hardware encoder opens
+SW_ENCODERS = {
+    # ultrafast: several times the throughput, but files can be ~3x bigger than veryfast
+    "libx264": ["-preset", "ultrafast", "-crf", "23"],
+}
 
 # ==========================================
 # 2. CONTENT MANAGER (Scraping & Text)
 # ==========================================
+# Every TTS cleanup rule as one alternation, so the text is scanned once.
+# Ages must be wrapped in matching brackets: "(23M)" or "[23M]".
+_TTS_CLEANUP_RE = re.compile(
+    r'\b(?P<aita>AITA)\b|\b(?P<wibta>WIBTA)\b'
+    r'|\((?P<age>\d+)\s*(?P<gender>[MF])\)|\[(?P<age_sq>\d+)\s*(?P<gender_sq>[MF])\]',
+    re.IGNORECASE
+)
+
+def _tts_cleanup_replacement(match: re.Match) -> str:
+    """Spoken form of one _TTS_CLEANUP_RE match."""
+    if match['aita']: return "Am I the a-hole"
+    if match['wibta']: return "Would I be the a-hole"
+    age = match['age'] or match['age_sq']
+    gender = match['gender'] or match['gender_sq']
+    return f"{age} {'male' if gender in 'Mm' else 'female'}"
+
 class ContentManager:
     def __init__(self, config: VideoConfig):
         self.config = config
+        # One keep-alive session: repeat fetches skip the TCP + TLS handshake
+        self.session = self._make_session()
+
+    def _make_session(self):
+        """An HTTP/2 httpx client when httpx (and h2) are installed, else a requests Session.
+        Both share the get/status_code/headers/content API used here. httpx.Client is
+        thread-safe; requests.Session isn't guaranteed to be, but fetch_any's threads only
+        make concurrent get() calls through urllib3's thread-safe pool. Nothing here sets
+        auth or changes headers after construction, and the only state get() itself mutates
+        is the cookie jar, which http.cookiejar guards with its own lock."""
+        headers = {"User-Agent": self.config.user_agent}
+        if httpx is not None:
+            # requests follows redirects by default, httpx doesn't: match requests
+            try:
+                return httpx.Client(http2=True, headers=headers, follow_redirects=True)
+            except ImportError:  # httpx without the h2 extra
+                return httpx.Client(headers=headers, follow_redirects=True)
+        session = requests.Session()
+        session.headers.update(headers)
+        return session
 
     def fetch_random_post(self, subreddit: str = None) -> Optional[Dict]:
         """Fetches a post from Reddit."""
@@ -68,25 +145,14 @@ class ContentManager:
         print(f"🕵️ Fetching from r/{target_sub}...")
         
         try:
-            url = f"https://www.reddit.com/r/{target_sub}/hot.json?limit=50"
-            headers = {"User-Agent": self.config.user_agent}
-            r = requests.get(url, headers=headers)
-            if r.status_code != 200: 
-                print(f"❌ Error: Status {r.status_code}")
-                return None
-
-            data = r.json()
-            posts = data['data']['children']
-            candidates = []
-
-            for p in posts:
-                post_data = p['data']
-                if post_data.get('stickied'): continue
-                title = post_data.get('title', '')
-                body = post_data.get('selftext', '')
-                
-                if 400 < len(body) < 1200: 
-                    candidates.append({"title": title, "body": body})
+            data = self._get_hot_listing(target_sub)
+            if data is None: return None
+            posts = [p['data'] for p in data['data']['children']]
+            candidates = [
+                {"title": post.get('title', ''), "body": body}
+                for post in posts
+                if not post.get('stickied') and 400 < len(body := post.get('selftext', '')) < 1200
+            ]
             
             if candidates:
                 return random.choice(candidates)
@@ -95,16 +161,71 @@ class ContentManager:
             print(f"❌ Error fetching post: {e}")
             return None
 
+    def _get_hot_listing(self, subreddit: str) -> Optional[Dict]:
+        """GETs r/<subreddit>/hot.json. The on-disk copy is reused outright while younger
+        than reddit_cache_ttl, then revalidated with If-None-Match so an unchanged
+        listing comes back as a body-less 304."""
+        json_path = os.path.join(self.config.reddit_cache_dir, f"reddit_{subreddit}.json")
+        etag_path = os.path.join(self.config.reddit_cache_dir, f"reddit_{subreddit}.etag")
+
+        # A fresh enough copy is used as is, without even a revalidation round-trip
+        if os.path.exists(json_path) and time.time() - os.path.getmtime(json_path) < self.config.reddit_cache_ttl:
+            with open(json_path, "rb") as f:
+                return json_loads(f.read())
+
+        headers = {}
+        if os.path.exists(json_path) and os.path.exists(etag_path):
+            with open(etag_path) as f:
+                headers["If-None-Match"] = f.read().strip()
+
+        url = f"https://www.reddit.com/r/{subreddit}/hot.json"
+        r = self.session.get(url, params={"limit": 50}, headers=headers, timeout=10)
+        if r.status_code == 304:
+            os.utime(json_path)  # Confirmed current: restart its TTL
+            with open(json_path, "rb") as f:
+                return json_loads(f.read())
+        if r.status_code != 200: 
+            print(f"❌ Error: Status {r.status_code}")
+            return None
+
+        # Temp name + os.replace: a killed run never leaves a truncated file behind.
+        # The old ETag goes first, so it can never vouch for a different body.
+        os.makedirs(self.config.reddit_cache_dir, exist_ok=True)
+        if os.path.exists(etag_path):
+            os.remove(etag_path)
+        with open(json_path + ".part", "wb") as f:
+            f.write(r.content)
+        os.replace(json_path + ".part", json_path)
+        etag = r.headers.get("ETag")
+        if etag:
+            with open(etag_path + ".part", "w") as f:
+                f.write(etag)
+            os.replace(etag_path + ".part", etag_path)
+        return json_loads(r.content)
+
+    def fetch_any(self) -> Optional[Dict]:
+        """Fetches from every configured subreddit at once; returns the first post found.
+        Subreddits are submitted in random order so a consistently fast one doesn't always
+        win. Losing fetches aren't waited on: they finish in the background after this
+        returns and may still print their progress/error lines."""
+        subs = self.config.subreddits
+        ex = ThreadPoolExecutor(max_workers=min(8, len(subs)))
+        pending = {ex.submit(self.fetch_random_post, sub) for sub in random.sample(subs, len(subs))}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    post = future.result()
+                    if post: return post
+            return None
+        finally:
+            # Don't hold the winner back waiting on slower subreddits
+            ex.shutdown(wait=False, cancel_futures=True)
+
     @staticmethod
     def clean_text_for_tts(text: str) -> str:
-        """Regex cleanup for cleaner speech."""
-        text = re.sub(r'\bAITA\b', "Am I the a-hole", text, flags=re.IGNORECASE)
-        text = re.sub(r'\bWIBTA\b', "Would I be the a-hole", text, flags=re.IGNORECASE)
-        text = re.sub(r'\((\d+)\s*[Mm]\)', r'\1 male', text)
-        text = re.sub(r'\((\d+)\s*[Ff]\)', r'\1 female', text)
-        text = re.sub(r'\[(\d+)\s*[Mm]\]', r'\1 male', text)
-        text = re.sub(r'\[(\d+)\s*[Ff]\]', r'\1 female', text)
-        return text
+        """Regex cleanup for cleaner speech, in one pass over the text."""
+        return _TTS_CLEANUP_RE.sub(_tts_cleanup_replacement, text)
 
     @staticmethod
     def split_text_smartly(text: str) -> List[str]:
@@ -120,6 +241,32 @@ class TTSManager:
     def __init__(self, config: VideoConfig):
         self.config = config
         self.client = None
+        # Built once and shared by every synthesis thread (only ever read)
+        self.voice = texttospeech.VoiceSelectionParams(language_code="en-US", name=config.tts_voice)
+        # Raw PCM at the mix rate: no temp MP3 to write, re-open and decode
+        self.audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+            sample_rate_hertz=44100,
+            speaking_rate=1.45 
+        )
+        # TTS has occasional multi-second stalls: cap each attempt (see _deadlines), then
+        # abandon and retry it rather than hold up the whole pipeline
+        self.retry = api_retry.Retry(
+            predicate=api_retry.if_exception_type(
+                api_exceptions.DeadlineExceeded, api_exceptions.ServiceUnavailable
+            ),
+            initial=0.1, maximum=1.0
+        )
+        # StreamingSynthesize has far lower latency but only serves Chirp 3 HD voices
+        self.streaming = "Chirp3-HD" in config.tts_voice
+        self.streaming_config = texttospeech.StreamingSynthesizeConfig(
+            voice=self.voice,
+            streaming_audio_config=texttospeech.StreamingAudioConfig(
+                audio_encoding=texttospeech.AudioEncoding.PCM,  # Headerless 16-bit mono
+                sample_rate_hertz=44100,
+                speaking_rate=1.45
+            )
+        )
         
         if not self.config.mock_tts:
             try:
@@ -128,8 +275,9 @@ class TTSManager:
                 print(f"⚠️ Google Creds error: {e}. Switching to Mock TTS.")
                 self.config.mock_tts = True
 
-    def generate_audio(self, text: str) -> Tuple[Optional[str], float]:
-        """Returns (filepath, duration). If mock, returns (None, duration)."""
+    def generate_audio(self, text: str) -> Tuple[Optional[np.ndarray], float]:
+        """Returns (samples, duration), samples being 44.1 kHz stereo float32.
+        If mock, returns (None, duration)."""
         spoken_text = ContentManager.clean_text_for_tts(text)
         word_count = len(spoken_text.split())
         estimated_dur = max(1.0, (word_count / self.config.avg_wpm) * 60)
@@ -138,30 +286,214 @@ class TTSManager:
             return None, estimated_dur
 
         try:
-            synthesis_input = texttospeech.SynthesisInput(text=spoken_text)
-            voice = texttospeech.VoiceSelectionParams(language_code="en-US", name="en-US-Wavenet-C")
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3,
-                speaking_rate=1.45 
-            )
-            response = self.client.synthesize_speech(input=synthesis_input, voice=voice, audio_config=audio_config)
-            
-            filename = os.path.join(self.config.temp_audio_dir, f"tts_{uuid.uuid4()}.mp3")
-            with open(filename, "wb") as f:
-                f.write(response.audio_content)
+            retry, timeout = self._deadlines(spoken_text)
+            if self.streaming:
+                raw, fps, channels = self._synthesize_streaming(spoken_text, retry, timeout), 44100, 1
+            else:
+                synthesis_input = texttospeech.SynthesisInput(text=spoken_text)
+                response = self.client.synthesize_speech(
+                    input=synthesis_input, voice=self.voice, audio_config=self.audio_config,
+                    retry=retry, timeout=timeout
+                )
+                # LINEAR16 responses are a complete WAV file
+                with wave.open(io.BytesIO(response.audio_content)) as wav:
+                    fps = wav.getframerate()
+                    channels = wav.getnchannels()
+                    raw = wav.readframes(wav.getnframes())
+
+            samples = np.frombuffer(raw, dtype=np.int16).reshape(-1, channels).astype(np.float32) / 32768.0
+            if channels == 1:
+                samples = np.repeat(samples, 2, axis=1)  # Stereo, like the rest of the mix
+            if fps != 44100:  # Only if the API ignored sample_rate_hertz; nearest sample
+                samples = samples[np.arange(round(len(samples) * 44100 / fps)) * fps // 44100]
             
-            # Get exact duration
-            with AudioFileClip(filename) as temp_clip:
-                actual_dur = temp_clip.duration
-            return filename, actual_dur
+            # Exact duration straight from the sample count
+            return samples, samples.shape[0] / 44100
 
         except Exception as e:
             print(f"❌ TTS API Error: {e}. Using mock duration.")
             return None, estimated_dur
 
+    def _deadlines(self, spoken_text: str) -> Tuple[api_retry.Retry, ConstantTimeout]:
+        """(retry, per-attempt timeout) for one synthesis call. A short post gets 3 s per
+        attempt; long ones (often a single unpunctuated 1000-char sentence) legitimately
+        take longer, so allow an extra second per 100 characters. The retry's overall
+        budget leaves room for about five attempts either way."""
+        per_attempt = 3.0 + len(spoken_text) / 100
+        return self.retry.with_timeout(5 * per_attempt), ConstantTimeout(per_attempt)
+
+    def _synthesize_streaming(self, spoken_text: str, retry: api_retry.Retry,
+                              timeout: ConstantTimeout) -> bytes:
+        """Synthesizes over StreamingSynthesize: one config request, then the text.
+        Returns the raw PCM chunks joined in memory. Same per-attempt timeout + retry
+        as the batch call; each attempt sends a fresh request iterator and reads the
+        whole stream, since a stall can surface mid-stream."""
+        def attempt():
+            stream = self.client.streaming_synthesize(iter([
+                texttospeech.StreamingSynthesizeRequest(streaming_config=self.streaming_config),
+                texttospeech.StreamingSynthesizeRequest(
+                    input=texttospeech.StreamingSynthesisInput(text=spoken_text)
+                ),
+            ]), timeout=timeout)
+            return b"".join(response.audio_content for response in stream)
+
+        return retry(attempt)()
+
 # ==========================================
 # 4. VIDEO ENGINE (Visuals & Composing)
 # ==========================================
+def _clip_to_rgba(clip: TextClip) -> np.ndarray:
+    """Flattens a TextClip (RGB frame + alpha mask) into one RGBA uint8 array."""
+    alpha = (clip.mask.get_frame(0) * 255).astype(np.uint8)
+    rgba = np.dstack([clip.get_frame(0), alpha])
+    clip.close()
+    return rgba
+
+@lru_cache(maxsize=64)
+def _load_font(font: str, font_size: int) -> ImageFont.FreeTypeFont:
+    """Loads (once) a Pillow font for in-process text measurement."""
+    return ImageFont.truetype(font, font_size)
+
+def _caption_height(text: str, font_size: int, font: str, width: int) -> int:
+    """Height TextClip(method='caption') would give `text`, measured with Pillow
+    metrics only. Mirrors MoviePy's greedy word wrap and 4px interline."""
+    font_pil = _load_font(font, font_size)
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    lines, current_line = [], ""
+    for word in text.split(" "):
+        temp_line = current_line + " " + word if current_line else word
+        left, _, right, _ = draw.multiline_textbbox((0, 0), temp_line, font=font_pil, spacing=4)
+        if right - left <= width:
+            current_line = temp_line
+        else:
+            lines.append(current_line)
+            current_line = word
+    if current_line: lines.append(current_line)
+    _, top, _, bottom = draw.multiline_textbbox((0, 0), "\n".join(lines), font=font_pil, spacing=4, anchor="lm")
+    return int(bottom - top)
+
+def _render_words(words: List[str], font_size: int, color: str, stroke_width: int, font: str) -> List[np.ndarray]:
+    """Rasterizes stroked words as separate RGBA sprites, drawn straight with Pillow.
+    All sprites share the sentence's row band, so the words sit on one baseline."""
+    font_pil = _load_font(font, font_size)
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    # Same "lm" anchor TextClip draws with, so sprites match its label rendering
+    _, top, _, bottom = draw.textbbox((0, 0), " ".join(words), font=font_pil, stroke_width=stroke_width, anchor="lm")
+    height = int(np.ceil(bottom - top))
+
+    sprites = []
+    for word in words:
+        left, _, right, _ = draw.textbbox((0, 0), word, font=font_pil, stroke_width=stroke_width, anchor="lm")
+        left = int(np.floor(left))
+        img = Image.new("RGBA", (int(np.ceil(right)) - left, height))
+        ImageDraw.Draw(img).text(
+            (-left, -top), word, fill=color, font=font_pil,
+            stroke_width=stroke_width, stroke_fill='black', anchor="lm"
+        )
+        sprites.append(np.asarray(img))
+    return sprites
+
+def _render_caption(text: str, font_size: int, font: str, width: int) -> np.ndarray:
+    """Rasterizes a word-wrapped caption block (the title, at its fitted size)."""
+    return _clip_to_rgba(TextClip(
+        text=text, font_size=font_size, color='white',
+        font=font, method='caption',
+        size=(width, None), text_align='left'
+    ))
+
+def _paste(canvas: np.ndarray, img: np.ndarray, x: float, y: float):
+    """Copies `img` onto `canvas` at (x, y), clipped to the canvas bounds."""
+    x, y = int(x), int(y)
+    h, w = img.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, canvas.shape[1]), min(y + h, canvas.shape[0])
+    if x1 <= x0 or y1 <= y0: return
+    canvas[y0:y1, x0:x1] = img[y0 - y:y1 - y, x0 - x:x1 - x]
+
+def _render_karaoke_frames(sentence: str, body_font: str) -> Tuple[int, List[np.ndarray]]:
+    """Renders one RGBA frame per word of `sentence`, with that word highlighted.
+    Frames are cropped to the rows the text occupies; returns (top row, frames)."""
+    words = sentence.split()
+
+    # 1. Rasterize each word once per color (the sprite doubles as the measurement)
+    white_imgs = _render_words(words, 70, 'white', 6, body_font)
+    yellow_imgs = _render_words(words, 70, 'yellow', 6, body_font)
+
+    # The stroke pads the sprite by stroke_width on every side; lay out on the glyph size
+    word_clips_data = [
+        {"idx": i, "w": img.shape[1] - 12, "h": img.shape[0] - 12}
+        for i, img in enumerate(white_imgs)
+    ]
+
+    # 2. Layout lines
+    lines, current_line, current_line_width = [], [], 0
+    max_width = 900
+    for data in word_clips_data:
+        if current_line_width + data['w'] > max_width:
+            lines.append(current_line)
+            current_line, current_line_width = [data], data['w']
+        else:
+            current_line.append(data)
+            current_line_width += data['w'] + 20
+    if current_line: lines.append(current_line)
+
+    # 3. Place every word on its page
+    pages = []
+    for page_lines in [lines[i:i+2] for i in range(0, len(lines), 2)]:
+        line_height = max(w['h'] for line in page_lines for w in line) + 15
+        total_block_height = len(page_lines) * line_height
+        curr_y = (1920 - total_block_height) / 2
+
+        placements = []  # (word index, x, y)
+        for line in page_lines:
+            line_total_width = sum(w['w'] for w in line) + (len(line)-1)*20
+            curr_x = (1080 - line_total_width) / 2
+            for w_data in line:
+                placements.append((w_data['idx'], curr_x, curr_y))
+                curr_x += w_data['w'] + 20
+            curr_y += line_height
+        pages.append(placements)
+
+    # Rows any page draws on (pages are centered, so this is a narrow band)
+    top = max(0, min(int(y) for page in pages for _, _, y in page))
+    bottom = min(1920, max(int(y) + white_imgs[j].shape[0] for page in pages for j, _, y in page))
+
+    # 4. Create Frames (one pre-composited canvas per active word, in word order)
+    frames = []
+    for placements in pages:
+        for active_idx, _, _ in placements:
+            canvas = np.zeros((bottom - top, 1080, 4), dtype=np.uint8)
+            for j, x, y in placements:
+                _paste(canvas, yellow_imgs[j] if j == active_idx else white_imgs[j], x, y - top)
+            frames.append(canvas)
+
+    return top, frames
+
+def _resize_frame(frame: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Resizes an RGB frame or float mask with OpenCV (SIMD) when available, else Pillow."""
+    if cv2 is not None:
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if frame.dtype != np.uint8:  # Masks are floats in [0, 1]
+        img = Image.fromarray((frame * 255).astype(np.uint8)).resize(size, Image.Resampling.LANCZOS)
+        return np.asarray(img) / 255.0
+    return np.asarray(Image.fromarray(frame).resize(size, Image.Resampling.LANCZOS))
+
+def _scale_clip(clip: VideoClip, scale_func) -> VideoClip:
+    """Animated resize (clip and mask) by `scale_func(t)`. Unlike vfx.Resize, frames
+    at scale 1 are passed through instead of being resampled to their own size."""
+    w, h = clip.size
+
+    def scale_frame(get_frame, t):
+        frame = get_frame(t)
+        scale = scale_func(t)
+        if scale == 1: return frame
+        return _resize_frame(frame, (max(1, int(w * scale)), max(1, int(h * scale))))
+
+    scaled = clip.transform(scale_frame)
+    if clip.mask is not None:
+        scaled.mask = clip.mask.transform(scale_frame)
+    return scaled
+
 class VideoEngine:
     def __init__(self, config: VideoConfig):
         self.config = config
@@ -177,34 +509,33 @@ class VideoEngine:
         max_text_width = max_x - start_x  
         max_text_height = max_y - start_y 
         
-        font_size = 60 
-        final_txt_clip = None
-        
-        while font_size > 10:
-            temp_txt = TextClip(
-                text=title_text, font_size=font_size, color='white', 
-                font=self.config.title_font, method='caption',
-                size=(max_text_width, None), text_align='left'
-            )
-            if temp_txt.h <= max_text_height:
-                final_txt_clip = temp_txt
-                break
-            font_size -= 2 
-            temp_txt.close()
-
-        if not final_txt_clip:
-             final_txt_clip = TextClip(
-                text=title_text, font_size=20, color='white', 
-                font=self.config.title_font, method='caption', size=(max_text_width, None)
-            )
-
-        static_box = ImageClip(self.config.title_box_image).with_duration(duration)
-        combined = CompositeVideoClip(
-            [static_box, final_txt_clip.with_position((start_x, start_y))], 
-            size=(static_box.w, static_box.h)
-        ).with_duration(duration)
-
-        anim = combined.with_effects([vfx.Resize(resize_func)])
+        # Largest size from 60 down to 12 (step 2) that fits. Height grows with size, so
+        # binary search it on Pillow metrics and rasterize only the winner.
+        sizes = range(12, 61, 2)
+        font_size = 20  # If nothing fits
+        lo, hi = 0, len(sizes) - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if _caption_height(title_text, sizes[mid], self.config.title_font, max_text_width) <= max_text_height:
+                font_size, lo = sizes[mid], mid + 1
+            else:
+                hi = mid - 1
+
+        caption = _render_caption(title_text, font_size, self.config.title_font, max_text_width)
+        final_txt_clip = ImageClip(caption, transparent=True)
+
+        # Box + text never change: composite them once, using the box itself as the
+        # base (no transparent fill layer), and animate the flattened image
+        static_box = ImageClip(self.config.title_box_image)
+        card = CompositeVideoClip(
+            [static_box, final_txt_clip.with_position((start_x, start_y))], use_bgclip=True
+        )
+        combined = ImageClip(card.get_frame(0))
+        if card.mask is not None:
+            combined = combined.with_mask(ImageClip(card.mask.get_frame(0), is_mask=True))
+        combined = combined.with_duration(duration)
+
+        anim = _scale_clip(combined, resize_func)
         
         final_comp = CompositeVideoClip(
             [anim.with_position("center")], size=(1080, 1920)
@@ -212,120 +543,185 @@ class VideoEngine:
         
         return final_comp
 
-    def create_karaoke_clip(self, sentence: str, audio_duration: float) -> Optional[VideoFileClip]:
+    def create_karaoke_clip(self, sentence: str, audio_duration: float) -> Optional[VideoClip]:
         """Creates the word-by-word highlighting clip."""
         words = sentence.split()
         if not words: return None
 
-        total_chars = sum(len(w) for w in words)
-        word_durations = [(len(w) / total_chars) * audio_duration for w in words]
-
-        # 1. Measure words
-        word_clips_data = [] 
-        for w in words:
-            temp = TextClip(text=w, font_size=70, font=self.config.body_font, method='label')
-            word_clips_data.append({"text": w, "w": temp.w, "h": temp.h})
-            temp.close()
-
-        # 2. Layout lines
-        lines, current_line, current_line_width = [], [], 0
-        max_width = 900
-        for data in word_clips_data:
-            if current_line_width + data['w'] > max_width:
-                lines.append(current_line)
-                current_line, current_line_width = [data], data['w']
-            else:
-                current_line.append(data)
-                current_line_width += data['w'] + 20
-        if current_line: lines.append(current_line)
-
-        # 3. Create Frames
-        pages = [lines[i:i+2] for i in range(0, len(lines), 2)]
-        final_clips = []
-        word_global_index = 0
-        
-        for page in pages:
-            line_height = max(w['h'] for line in page for w in line) + 15
-            total_block_height = len(page) * line_height
-            start_y = (1920 - total_block_height) / 2
-            
-            page_words_flat = [w for line in page for w in line]
-
-            for i, _ in enumerate(page_words_flat):
-                current_word_duration = word_durations[word_global_index]
-                frame_texts = []
-                curr_y = start_y
-                temp_idx_counter = 0
-                
-                for line in page:
-                    line_total_width = sum(w['w'] for w in line) + (len(line)-1)*20
-                    curr_x = (1080 - line_total_width) / 2
-                    
-                    for w_data in line:
-                        is_active = (temp_idx_counter == i)
-                        txt = TextClip(
-                            text=w_data['text'],
-                            font_size=70,
-                            color='yellow' if is_active else 'white',
-                            stroke_color='black',
-                            stroke_width=6,
-                            font=self.config.body_font,
-                            method='label'
-                        ).with_position((curr_x, curr_y)).with_duration(current_word_duration)
-                        
-                        frame_texts.append(txt)
-                        curr_x += w_data['w'] + 20
-                        temp_idx_counter += 1
-                    curr_y += line_height
-
-                base = ColorClip(size=(1080, 1920), color=(0,0,0,0), duration=current_word_duration)
-                final_clips.append(CompositeVideoClip([base] + frame_texts))
-                word_global_index += 1
-
-        return concatenate_videoclips(final_clips)
-
-    def assemble_final_video(self, video_clips, audio_clips):
-        """Combines visuals, voiceover, background music, and background video."""
+        top, frames = _render_karaoke_frames(sentence, self.config.body_font)
+        bottom = top + frames[0].shape[0]
+
+        # Each word gets screen time proportional to its length
+        lens = np.fromiter((len(w) for w in words), dtype=np.float32, count=len(words))
+        word_durations = lens * (audio_duration / lens.sum())
+        word_starts = np.zeros_like(word_durations)
+        np.cumsum(word_durations[:-1], out=word_starts[1:])
+
+        # One clip that looks the active frame up by time (no per-word sub-clips).
+        # Frames only cover the text rows, so expand to full size once per word change.
+        full = {"idx": None}
+
+        def full_frame(t, want_mask):
+            idx = min(int(np.searchsorted(word_starts, t, side='right')) - 1, len(frames) - 1)
+            if full["idx"] != idx:
+                rgb = np.zeros((1920, 1080, 3), dtype=np.uint8)
+                mask = np.zeros((1920, 1080), dtype=np.float32)
+                rgb[top:bottom] = frames[idx][..., :3]
+                mask[top:bottom] = frames[idx][..., 3] * np.float32(1 / 255)
+                full.update(idx=idx, rgb=rgb, mask=mask)
+            return full["mask"] if want_mask else full["rgb"]
+
+        clip = VideoClip(lambda t: full_frame(t, False), duration=audio_duration)
+        return clip.with_mask(VideoClip(lambda t: full_frame(t, True), is_mask=True, duration=audio_duration))
+
+    def prepare_background(self, total_duration: float, fps: int) -> str:
+        """Returns the path of the background looped, scaled and cropped to 1080x1920 at
+        `fps`. Renders are cached per (source mtime, fps, duration rounded up to 15 s)."""
+        bucket = 15 * int(np.ceil(total_duration / 15))
+        mtime = int(os.path.getmtime(self.config.subway_video))
+        name = os.path.splitext(os.path.basename(self.config.subway_video))[0]
+        path = os.path.join(self.config.background_cache_dir, f"{name}_1080x1920_{mtime}_{fps}fps_{bucket}s.mp4")
+        if os.path.exists(path):
+            return path
+
+        print(f"   Pre-rendering {bucket}s background...")
+        os.makedirs(self.config.background_cache_dir, exist_ok=True)
+        tmp_path = path + ".part.mp4"
+        subprocess.run(
+            [FFMPEG_BINARY, "-y", "-loglevel", "error",
+             "-stream_loop", "-1", "-i", self.config.subway_video, "-t", str(bucket), "-an",
+             "-vf", f"fps={fps},scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,setsar=1",
+             "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p", tmp_path],
+            check=True
+        )
+        os.replace(tmp_path, path)  # Never leave a half-written file under the cache name
+        return path
+
+    def assemble_final_video(self, video_clips, audio_arrays, fps: int, encoder: str):
+        """Mixes the audio, then has ONE ffmpeg process overlay the text layer (piped in
+        as raw RGBA) on the cached background and encode the result."""
         print("🎬 Assembling Final Video...")
-        full_audio = concatenate_audioclips(audio_clips)
-        full_text_video = concatenate_videoclips(video_clips)
-        total_duration = full_audio.duration
+        # Segments play back to back: give each its start time and look the active one up
+        # per frame, rather than wrapping them all in a concatenated clip
+        offsets = np.cumsum([0.0] + [clip.duration for clip in video_clips[:-1]])
+        overlays = [clip.with_start(start) for clip, start in zip(video_clips, offsets)]
 
-        # Background Music
+        # Voiceover as one contiguous sample array: a single memcpy per segment
+        voice = np.concatenate(audio_arrays, dtype=np.float32)
+        n_samples = voice.shape[0]
+        total_duration = n_samples / 44100
+
+        # Background Music, mixed straight into the voiceover array
         if os.path.exists(self.config.background_music):
-            bg_music = AudioFileClip(self.config.background_music)
-            if bg_music.duration > total_duration:
-                max_start = bg_music.duration - total_duration
+            music_clip = AudioFileClip(self.config.background_music)
+            if music_clip.duration > total_duration:
+                max_start = music_clip.duration - total_duration
                 start_time = random.uniform(0, max_start)
-                bg_music = bg_music.subclipped(start_time, start_time + total_duration)
+                music = music_clip.subclipped(start_time, start_time + total_duration).to_soundarray(fps=44100)
             else:
-                bg_music = concatenate_audioclips([bg_music] * (int(total_duration / bg_music.duration) + 1))
-                bg_music = bg_music.subclipped(0, total_duration)
+                music = music_clip.to_soundarray(fps=44100)
+                music = np.tile(music, (n_samples // len(music) + 1, 1))
+            music_clip.close()
             
-            bg_music = bg_music.with_volume_scaled(0.15).with_effects([afx.AudioFadeIn(2.0)])
-            full_audio = CompositeAudioClip([full_audio, bg_music])
+            music = music[:n_samples].astype(np.float32) * 0.15
+            fade_len = min(n_samples, 2 * 44100)  # 2s fade-in
+            music[:fade_len] *= np.linspace(0, 1, fade_len, dtype=np.float32)[:, None]
+            voice[:len(music)] += music
         else:
             print(f"⚠️ Warning: Music {self.config.background_music} not found.")
 
-        # Background Video
-        bg = VideoFileClip(self.config.subway_video).without_audio()
-        if bg.duration < total_duration:
-            bg = bg.with_effects([vfx.Loop(duration=total_duration + 1)])
-        
-        # Crop Logic
-        target_ratio = 1080 / 1920
-        bg_ratio = bg.w / bg.h
-        if bg_ratio > target_ratio:
-            bg = bg.resized(height=1920)
-        else:
-            bg = bg.resized(width=1080)
-        bg = bg.cropped(width=1080, height=1920, x_center=bg.w/2, y_center=bg.h/2)
-        
-        # Final Composite
-        final = CompositeVideoClip([bg, full_text_video], size=(1080, 1920))
-        final = final.with_audio(full_audio).with_duration(total_duration)
-        
-        return final, bg # return bg handle to close later
+        # Before any pipe or temp file exists, so a failure here leaks nothing
+        background_path = self.prepare_background(total_duration, fps)
+
+        pcm = (np.clip(voice, -1, 1) * 32767).astype("<i2").tobytes()
+        audio_pipe = audio_path = None
+        if os.name == "posix":
+            # Hand ffmpeg the raw samples over an inherited pipe: no temp file at all
+            audio_pipe = os.pipe()
+            audio_input = ["-f", "s16le", "-ar", "44100", "-ac", "2", "-i", f"pipe:{audio_pipe[0]}"]
+        else:  # No fd inheritance for subprocesses on Windows
+            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
+                audio_path = f.name
+            with wave.open(audio_path, "wb") as wav:
+                wav.setnchannels(2)
+                wav.setsampwidth(2)
+                wav.setframerate(44100)
+                wav.writeframes(pcm)
+            audio_input = ["-i", audio_path]
+
+        # Input 0 is the text layer on stdin, input 1 the background, input 2 the audio
+        filter_graph = "[1:v][0:v]overlay=0:0:shortest=1,format=yuv420p[v]"
+        try:
+            proc = subprocess.Popen(
+                [FFMPEG_BINARY, "-y", "-loglevel", "error",
+                 "-f", "rawvideo", "-pix_fmt", "rgba", "-s", "1080x1920", "-r", str(fps), "-i", "-",
+                 "-i", background_path,
+                 *audio_input,
+                 "-filter_complex", filter_graph, "-map", "[v]", "-map", "2:a",
+                 "-c:v", encoder, *HW_ENCODERS.get(encoder, SW_ENCODERS.get(encoder, [])),
+                 "-g", str(2 * fps), "-keyint_min", str(fps),  # 2 s GOPs at any fps
+                 "-c:a", "aac", "-threads", "0",
+                 "-movflags", "+faststart",  # moov atom up front: playback starts before download ends
+                 self.config.output_filename],
+                stdin=subprocess.PIPE, pass_fds=audio_pipe[:1] if audio_pipe else ()
+            )
+        except BaseException:
+            if audio_pipe:
+                os.close(audio_pipe[0])
+                os.close(audio_pipe[1])
+            if audio_path: os.remove(audio_path)
+            raise
+
+        audio_writer = None
+        if audio_pipe:
+            os.close(audio_pipe[0])  # ffmpeg holds its own copy
+
+            def write_audio():
+                # Its own thread: ffmpeg reads audio and video interleaved, so writing
+                # either one to completion first would deadlock on a full pipe
+                try:
+                    with open(audio_pipe[1], "wb") as f:
+                        f.write(pcm)
+                except BrokenPipeError:
+                    pass  # ffmpeg exited early; its return code says why
+
+            audio_writer = threading.Thread(target=write_audio, daemon=True)
+            audio_writer.start()
+
+        n_frames = int(np.ceil(total_duration * fps))
+        print(f"   Encoding {n_frames} frames with {encoder}...")
+        rgba = np.empty((1920, 1080, 4), dtype=np.uint8)
+        alpha = np.empty((1920, 1080), dtype=np.float32)
+        previous_frame = previous_mask = None
+        try:
+            for i in range(n_frames):
+                t = i / fps
+                overlay = overlays[max(0, int(np.searchsorted(offsets, t, side='right')) - 1)]
+                frame = overlay.get_frame(t - overlay.start)
+                mask = overlay.mask.get_frame(t - overlay.start) if overlay.mask is not None else None
+                # Karaoke clips hand back the very same arrays until the next word, so
+                # a held word is re-sent as is instead of being re-packed every frame
+                if frame is not previous_frame or mask is not previous_mask:
+                    rgba[..., :3] = frame
+                    if mask is None:
+                        rgba[..., 3] = 255
+                    else:
+                        np.multiply(mask, 255, out=alpha)
+                        alpha += 0.5
+                        rgba[..., 3] = alpha  # Truncating cast: round to nearest
+                    previous_frame, previous_mask = frame, mask
+                proc.stdin.write(rgba.data)
+        except BrokenPipeError:
+            pass  # ffmpeg exited early; its return code says why
+        finally:
+            proc.stdin.close()
+            proc.wait()
+            if audio_writer: audio_writer.join()
+            if audio_path: os.remove(audio_path)
+            for overlay in overlays: overlay.close()
+
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, FFMPEG_BINARY)
 
 # ==========================================
 # 5. PIPELINE (The Controller)
@@ -336,19 +732,48 @@ class VideoPipeline:
         self.content_mgr = ContentManager(config)
         self.tts_mgr = TTSManager(config)
         self.video_engine = VideoEngine(config)
-        self.audio_resources = []
+        self.encoder = config.video_codec or self._detect_encoder()
+
+    @staticmethod
+    def _detect_encoder() -> str:
+        """Picks the first hardware H.264 encoder that can actually open, else libx264."""
+        try:
+            listed = subprocess.check_output(
+                [FFMPEG_BINARY, "-hide_banner", "-encoders"], stderr=subprocess.DEVNULL, text=True
+            )
+        except Exception as e:
+            print(f"⚠️ Could not list ffmpeg encoders: {e}. Using libx264.")
+            return "libx264"
+
+        for encoder in HW_ENCODERS:
+            if encoder not in listed: continue
+            # Being compiled in doesn't mean a GPU is present, so try a tiny encode
+            probe = subprocess.run(
+                [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+                 "-f", "lavfi", "-i", "color=size=256x256:duration=0.1",
+                 "-c:v", encoder, "-f", "null", "-"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            if probe.returncode == 0:
+                print(f"⚡ Using hardware encoder {encoder}.")
+                return encoder
+        return "libx264"
 
     def run(self, specific_post=None):
         """Runs the full pipeline. pass `specific_post` dict to skip scraping."""
         
         # 1. Get Content
-        post = specific_post if specific_post else self.content_mgr.fetch_random_post()
+        post = specific_post if specific_post else self.content_mgr.fetch_any()
         if not post: return
 
         print(f"🚀 Processing: {post['title']}")
         
         # 2. Process Text
         title_text = post["title"]
+        # The title's TTS needs nothing else, so it runs while the body is split
+        title_ex = ThreadPoolExecutor(max_workers=1)
+        title_audio = title_ex.submit(self.tts_mgr.generate_audio, title_text)
+        title_ex.shutdown(wait=False)  # The call still completes; the thread exits after it
         body_sentences = self.content_mgr.split_text_smartly(post["body"])
         
         if self.config.limit_sentences:
@@ -356,65 +781,81 @@ class VideoPipeline:
             body_sentences = body_sentences[:self.config.limit_sentences]
 
         # 3. Generate Assets
+        body_sentences = [s for s in body_sentences if s.strip()]
+        print(f"   Generating title + {len(body_sentences)} body sentences...")
         all_video_segments = []
-        all_audio_clips = []
-
-        try:
-            # Title
-            print("   Generating Title...")
-            t_file, t_dur = self.tts_mgr.generate_audio(title_text)
-            self._add_audio_clip(t_file, t_dur, all_audio_clips)
-            all_video_segments.append(self.video_engine.create_title_card(title_text, t_dur))
-
-            # Body
-            print(f"   Generating {len(body_sentences)} body sentences...")
-            for sentence in body_sentences:
-                if not sentence.strip(): continue
-                a_file, a_dur = self.tts_mgr.generate_audio(sentence)
-                self._add_audio_clip(a_file, a_dur, all_audio_clips)
-                
-                vid_seg = self.video_engine.create_karaoke_clip(sentence, a_dur)
-                if vid_seg: all_video_segments.append(vid_seg)
-
-            # 4. Assembly & Render
-            final_video, bg_handle = self.video_engine.assemble_final_video(all_video_segments, all_audio_clips)
-            
-            final_video.write_videofile(
-                self.config.output_filename, 
-                fps=24 if self.config.mock_tts else 30, 
-                codec="libx264", 
-                audio_codec="aac",
-                threads=4
-            )
-            
-            # Cleanup Handles
-            bg_handle.close()
-            final_video.close()
-
-        finally:
-            self._cleanup()
+        all_audio_arrays = []
+
+        for samples, duration, vid_seg in self._generate_segments(title_text, body_sentences, title_audio):
+            self._add_audio(samples, duration, all_audio_arrays)
+            if vid_seg: all_video_segments.append(vid_seg)
+
+        # 4. Assembly & Render
+        self.video_engine.assemble_final_video(
+            all_video_segments, all_audio_arrays, self.config.fps, self.encoder
+        )
+        print(f"✅ Wrote {self.config.output_filename}")
+
+    def _generate_segments(self, title_text, body_sentences, title_audio=None):
+        """Returns (audio_samples, duration, video_segment) for the title then each body
+        sentence, in order. TTS and visual building run as overlapping stages:
+
+            TTS thread pool -> tts_q -> visuals thread -> seg_q -> caller
+
+        so sentence N's clip is built while later sentences are still synthesizing.
+        Karaoke frames are rendered in-process: a sentence takes ~0.1 s, far less than
+        the ~1 s it takes a spawned worker process just to import this module.
+        A stage that fails passes its exception downstream; `None` marks the end.
+        `title_audio` is an already-started generate_audio future for the title, if any.
+        """
+        texts = [title_text] + body_sentences
+        tts_q, seg_q = queue.Queue(4), queue.Queue(4)
+
+        def tts_stage():
+            try:
+                # TTS is pure network wait, so every request is in flight at once
+                with ThreadPoolExecutor(max_workers=min(8, len(texts))) as ex:
+                    futures = [title_audio or ex.submit(self.tts_mgr.generate_audio, texts[0])]
+                    futures += [ex.submit(self.tts_mgr.generate_audio, text) for text in texts[1:]]
+                    for idx, future in enumerate(futures):
+                        tts_q.put((idx, *future.result()))
+            except Exception as e:
+                tts_q.put(e)
+            tts_q.put(None)
 
-    def _add_audio_clip(self, file_path, duration, list_ref):
-        """Helper to handle mock silence vs real audio files."""
-        if file_path is None:
+        def visuals_stage():
+            try:
+                while (item := tts_q.get()) is not None:
+                    if isinstance(item, Exception): raise item
+                    idx, samples, duration = item
+                    if idx == 0:
+                        vid_seg = self.video_engine.create_title_card(texts[0], duration)
+                    else:
+                        vid_seg = self.video_engine.create_karaoke_clip(texts[idx], duration)
+                    seg_q.put((idx, samples, duration, vid_seg))
+            except Exception as e:
+                seg_q.put(e)
+            seg_q.put(None)
+
+        # Daemon threads: if a stage fails, the one upstream may be left blocked on a full queue
+        for stage in (tts_stage, visuals_stage):
+            threading.Thread(target=stage, daemon=True).start()
+
+        results = [None] * len(texts)
+        while (item := seg_q.get()) is not None:
+            if isinstance(item, Exception): raise item
+            idx, samples, duration, vid_seg = item
+            results[idx] = (samples, duration, vid_seg)
+        return results
+
+    def _add_audio(self, samples, duration, list_ref):
+        """Helper to handle mock silence vs real TTS audio. Appends 44.1 kHz stereo
+        float32 samples, so the whole voiceover is a single np.concatenate."""
+        if samples is None:
             # Mock Silence
-            silence = AudioArrayClip(np.zeros((int(44100 * duration), 2)), fps=44100)
-            list_ref.append(silence)
+            list_ref.append(np.zeros((round(44100 * duration), 2), dtype=np.float32))
         else:
-            clip = AudioFileClip(file_path)
-            list_ref.append(clip)
-            self.audio_resources.append(clip) # Keep track to close later
-
-    def _cleanup(self):
-        """Clean up open files and temp directory."""
-        print("🧹 Cleaning up...")
-        for c in self.audio_resources: 
-            try: c.close()
-            except: pass
-            
-        if os.path.exists(self.config.temp_audio_dir):
-            shutil.rmtree(self.config.temp_audio_dir)
-
+            list_ref.append(samples)
 
 # ==========================================
 # 6. USAGE EXAMPLES